@@ -35,9 +35,12 @@ setup(
     package_dir={"": "src"},
     include_package_data=True,  # see MANIFEST.in
     zip_safe=True,
-    install_requires=["requests>=2.20.0", "cryptography>=2.8", "numpy>=1.18", "protobuf>=3.12.4", "aiohttp>=3.7.4.post0"],
+    install_requires=["requests>=2.20.0", "cryptography>=2.8", "numpy>=1.18", "protobuf>=3.12.4", "aiohttp>=3.7.4.post0", "orjson>=3.4.0"],
     extras_require={
-        "all": ["pytest>=6.2.1", "click>=7.1", "pytest-asyncio>=0.14.0"]
+        "all": ["pytest>=6.2.1", "click>=7.1", "pytest-asyncio>=0.14.0"],
+        "http2": ["httpx[http2]>=0.18.0"],
+        "stream": ["ijson>=3.1"],
+        "br": ["brotli>=1.0.9"],
     },
     classifiers=[
         'Programming Language :: Python :: 3.7',
@@ -32,8 +32,12 @@ from .client import (
     Client,
     State,
     Retry,
+    RPCCacheConfig,
     RequestStrategy,
     RequestWithBackups,
+    Transport,
+    RequestsTransport,
+    HTTPXTransport,
 )
 from .errors import (
     JsonRpcError,
@@ -66,10 +70,17 @@ from .jsonrpc_pb2 import (
 from .constants import (
     DEFAULT_CONNECT_TIMEOUT_SECS,
     DEFAULT_TIMEOUT_SECS,
+    DEFAULT_HTTP_POOL_SIZE,
+    DEFAULT_ASYNC_CONNECTION_LIMIT,
+    DEFAULT_ASYNC_DNS_CACHE_TTL_SECS,
+    DEFAULT_ASYNC_KEEPALIVE_TIMEOUT_SECS,
     DEFAULT_MAX_RETRIES,
     DEFAULT_RETRY_DELAY,
+    DEFAULT_RETRY_MAX_DELAY_SECS,
     DEFAULT_WAIT_FOR_TRANSACTION_TIMEOUT_SECS,
     DEFAULT_WAIT_FOR_TRANSACTION_WAIT_DURATION_SECS,
+    DEFAULT_WAIT_FOR_TRANSACTION_MIN_WAIT_DURATION_SECS,
+    DEFAULT_WAIT_FOR_TRANSACTION_MAX_WAIT_DURATION_SECS,
     USER_AGENT_HTTP_HEADER,
     # AccountRole#type field values
     ACCOUNT_ROLE_UNKNOWN,
@@ -3,16 +3,16 @@
 
 
 import time
-import copy
 import dataclasses
 import google.protobuf.json_format as parser
+import orjson
 import asyncio, aiohttp
 import typing
 import random
 import functools
+import collections
 
-from aiohttp import ClientSession
-from asyncio import as_completed
+from aiohttp import ClientSession, TCPConnector
 from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
 from logging import Logger, getLogger
 
@@ -22,11 +22,18 @@ from diem.jsonrpc.constants import (
     ACCOUNT_ROLE_PARENT_VASP,
     ACCOUNT_ROLE_CHILD_VASP,
     VM_STATUS_EXECUTED,
+    DEFAULT_ASYNC_CONNECTION_LIMIT,
+    DEFAULT_ASYNC_DNS_CACHE_TTL_SECS,
+    DEFAULT_ASYNC_KEEPALIVE_TIMEOUT_SECS,
     DEFAULT_MAX_RETRIES,
     DEFAULT_RETRY_DELAY,
+    DEFAULT_RETRY_MAX_DELAY_SECS,
     DEFAULT_WAIT_FOR_TRANSACTION_TIMEOUT_SECS,
-    DEFAULT_WAIT_FOR_TRANSACTION_WAIT_DURATION_SECS,
+    DEFAULT_WAIT_FOR_TRANSACTION_MIN_WAIT_DURATION_SECS,
+    DEFAULT_WAIT_FOR_TRANSACTION_MAX_WAIT_DURATION_SECS,
     USER_AGENT_HTTP_HEADER,
+    REQUEST_TEMPLATE,
+    MAX_PARENT_VASP_ACCOUNT_LOOKUPS,
 )
 from diem.jsonrpc.errors import (
     JsonRpcError,
@@ -39,6 +46,7 @@ from diem.jsonrpc.errors import (
     AccountNotFoundError,
 )
 from diem.jsonrpc.state import State
+from diem.jsonrpc.client import _parse_obj, _parse_list
 
 
 @dataclasses.dataclass
@@ -46,9 +54,19 @@ class Retry:
     max_retries: int
     delay_secs: float
     exception: typing.Type[Exception]
+    cap_secs: float = DEFAULT_RETRY_MAX_DELAY_SECS
 
     async def execute(self, coro):  # pyre-ignore
-        return await utils.with_retry(coro, self.max_retries, self.delay_secs, self.exception)
+        tries = 0
+        while tries < self.max_retries:
+            tries += 1
+            try:
+                return await coro()
+            except self.exception as e:
+                if tries < self.max_retries:
+                    await asyncio.sleep(utils.backoff_delay_secs(tries, self.delay_secs, self.cap_secs))
+                else:
+                    raise e
 
 
 class RequestStrategy:
@@ -58,7 +76,7 @@ class RequestStrategy:
     """
 
     async def send_request(
-        self, client: "AsyncClient", request: typing.Dict[str, typing.Any], ignore_stale_response: bool
+        self, client: "AsyncClient", request: bytes, ignore_stale_response: bool
     ) -> typing.Dict[str, typing.Any]:
         return await client._send_http_request(client._url, request, ignore_stale_response)
 
@@ -102,7 +120,7 @@ class RequestWithBackups(RequestStrategy):
         self._fallback = fallback
 
     async def send_request(
-        self, client: "AsyncClient", request: typing.Dict[str, typing.Any], ignore_stale_response: bool
+        self, client: "AsyncClient", request: bytes, ignore_stale_response: bool
     ) -> typing.Dict[str, typing.Any]:
         primary = asyncio.create_task(client._send_http_request(client._url, request, ignore_stale_response))
 
@@ -121,12 +139,26 @@ class RequestWithBackups(RequestStrategy):
             return await backup
 
     async def _first_success(self, primary: asyncio.Task, backup: asyncio.Task) -> typing.Dict[str, typing.Any]:
-        futures = as_completed({primary, backup})
-        first = next(futures)
+        done, pending = await asyncio.wait({primary, backup}, return_when=asyncio.FIRST_COMPLETED)
+        first = done.pop()
         try:
-            return await first
+            ret = first.result()
         except Exception:
-            return await next(futures)
+            return await (pending.pop() if pending else done.pop())
+        for task in pending:
+            task.cancel()
+        return ret
+
+
+def default_session_factory() -> ClientSession:
+    """creates a `aiohttp.ClientSession` with a connector tuned for keeping connections alive"""
+
+    connector = TCPConnector(
+        limit=DEFAULT_ASYNC_CONNECTION_LIMIT,
+        ttl_dns_cache=DEFAULT_ASYNC_DNS_CACHE_TTL_SECS,
+        keepalive_timeout=DEFAULT_ASYNC_KEEPALIVE_TIMEOUT_SECS,
+    )
+    return ClientSession(connector=connector)
 
 
 class AsyncClient:
@@ -143,7 +175,7 @@ class AsyncClient:
         retry: typing.Optional[Retry] = None,
         rs: typing.Optional[RequestStrategy] = None,
         logger: typing.Optional[Logger] = None,
-        session_factory: typing.Callable[[], ClientSession] = ClientSession,
+        session_factory: typing.Callable[[], ClientSession] = default_session_factory,
     ) -> None:
         self._url: str = server_url
         self._last_known_server_state: State = State(chain_id=-1, version=-1, timestamp_usecs=-1)
@@ -179,15 +211,18 @@ class AsyncClient:
         could not find the account by the parent_vasp_address found in ChildVASP account.
         """
 
-        account = await self.must_get_account(vasp_account_address)
-
-        if account.role.type == ACCOUNT_ROLE_PARENT_VASP:
-            return account
-        if account.role.type == ACCOUNT_ROLE_CHILD_VASP:
-            return await self.get_parent_vasp_account(account.role.parent_vasp_address)
+        address = vasp_account_address
+        for _ in range(MAX_PARENT_VASP_ACCOUNT_LOOKUPS):
+            account = await self.must_get_account(address)
+            if account.role.type == ACCOUNT_ROLE_PARENT_VASP:
+                return account
+            if account.role.type != ACCOUNT_ROLE_CHILD_VASP:
+                hex = utils.account_address_hex(address)
+                raise ValueError(f"given account address({hex}) is not a VASP account: {account}")
+            address = account.role.parent_vasp_address
 
         hex = utils.account_address_hex(vasp_account_address)
-        raise ValueError(f"given account address({hex}) is not a VASP account: {account}")
+        raise ValueError(f"could not find parent VASP account by following parent_vasp_address from {hex}")
 
     async def get_base_url_and_compliance_key(
         self, account_address: typing.Union[diem_types.AccountAddress, str]
@@ -197,15 +232,18 @@ class AsyncClient:
         ParentVASP or Designated Dealer account role has base_url and compliance key setup, which
         are used for offchain API communication.
         """
-        account = await self.must_get_account(account_address)
-
-        if account.role.compliance_key and account.role.base_url:
-            key = Ed25519PublicKey.from_public_bytes(bytes.fromhex(account.role.compliance_key))
-            return (account.role.base_url, key)
-        if account.role.parent_vasp_address:
-            return await self.get_base_url_and_compliance_key(account.role.parent_vasp_address)
-
-        raise ValueError(f"could not find base_url and compliance_key from account: {account}")
+        address = account_address
+        for _ in range(MAX_PARENT_VASP_ACCOUNT_LOOKUPS):
+            account = await self.must_get_account(address)
+            if account.role.compliance_key and account.role.base_url:
+                key = Ed25519PublicKey.from_public_bytes(bytes.fromhex(account.role.compliance_key))
+                return (account.role.base_url, key)
+            if not account.role.parent_vasp_address:
+                raise ValueError(f"could not find base_url and compliance_key from account: {account}")
+            address = account.role.parent_vasp_address
+
+        hex = utils.account_address_hex(account_address)
+        raise ValueError(f"could not find base_url and compliance_key by following parent_vasp_address from {hex}")
 
     async def must_get_account(self, account_address: typing.Union[diem_types.AccountAddress, str]) -> rpc.Account:
         """must_get_account raises AccountNotFoundError if account could not be found by given address"""
@@ -242,7 +280,7 @@ class AsyncClient:
         server.
         """
 
-        return copy.copy(self._last_known_server_state)
+        return self._last_known_server_state
 
     def update_last_known_state(self, chain_id: int, version: int, timestamp_usecs: int) -> None:
         """update last known server state
@@ -253,6 +291,8 @@ class AsyncClient:
         """
 
         curr = self._last_known_server_state
+        if curr.chain_id == chain_id and curr.version == version and curr.timestamp_usecs == timestamp_usecs:
+            return
         if curr.chain_id != -1 and curr.chain_id != chain_id:
             raise InvalidServerResponse(f"last known chain id {curr.chain_id}, " f"but got {chain_id}")
         if curr.version > version:
@@ -376,22 +416,41 @@ class AsyncClient:
             "get_account_state_with_proof", params, _parse_obj(lambda: rpc.AccountStateWithProof())
         )
 
-    async def get_vasp_domain_map(self, batch_size: int = 100) -> typing.Dict[str, str]:
+    async def get_vasp_domain_map(self, batch_size: int = 100, prefetch_depth: int = 4) -> typing.Dict[str, str]:
+        """get VASP domain map by reading all VASP domain events from treasury compliance account
+
+        After the first batch of events is fetched, up to `prefetch_depth` following batches are fetched
+        concurrently; events are still applied in sequence order. `prefetch_depth` less than 1 is treated as 1,
+        which fetches batches one by one.
+        """
+
         domain_map = {}
         event_index = 0
         tc_account = await self.must_get_account(TREASURY_ADDRESS)
         event_stream_key = tc_account.role.vasp_domain_events_key
-        while True:
-            events = await self.get_events(event_stream_key, event_index, batch_size)
-            for event in events:
-                if event.data.removed:
-                    del domain_map[event.data.domain]
-                else:
-                    domain_map[event.data.domain] = event.data.address
-            if len(events) == 0 or len(events) < batch_size:
-                break
-            event_index += batch_size
-        return domain_map
+        depth = 1
+        pending = collections.deque()
+        try:
+            while True:
+                while len(pending) < depth:
+                    pending.append(asyncio.ensure_future(self.get_events(event_stream_key, event_index, batch_size)))
+                    event_index += batch_size
+                events = await pending.popleft()
+                for event in events:
+                    if event.data.removed:
+                        del domain_map[event.data.domain]
+                    else:
+                        domain_map[event.data.domain] = event.data.address
+                if len(events) < batch_size:
+                    return domain_map
+                depth = max(1, prefetch_depth)
+        finally:
+            for task in pending:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    # retrieve error of the failed prefetch, otherwise asyncio logs it was never retrieved
+                    task.exception()
 
     async def support_diem_id(self) -> bool:
         tc_account = await self.must_get_account(TREASURY_ADDRESS)
@@ -489,10 +548,19 @@ class AsyncClient:
         number, but the transaction hash does not match the transactoin hash given in parameter.
         This means the executed transaction is from another process (which submitted transaction
         with same account address and sequence).
+
+        Polls the transaction every `wait_duration_secs` if it is provided; otherwise the polling interval
+        adapts to the server: it shrinks while new blocks are committed, and grows when the server state
+        does not change.
         """
+        loop = asyncio.get_event_loop()
         start_time = time.time()
-        max_wait = start_time + (timeout_secs or DEFAULT_WAIT_FOR_TRANSACTION_TIMEOUT_SECS)
-        while time.time() < max_wait:
+        max_wait = loop.time() + (timeout_secs or DEFAULT_WAIT_FOR_TRANSACTION_TIMEOUT_SECS)
+        interval = DEFAULT_WAIT_FOR_TRANSACTION_MIN_WAIT_DURATION_SECS
+        prev_timestamp_usecs = None
+        address_hex = utils.account_address_hex(address)
+        expected_hash = txn_hash.lower()
+        while loop.time() < max_wait:
             # Get last known state first before making `get_account_transaction` call,
             # so that we know for sure there is no transaction we are waiting for before
             # the state timestamp.
@@ -506,16 +574,27 @@ class AsyncClient:
             #       the transaction is included in the missed `n` transactions, we will raise
             #       unexpected TransactionExpired error.
             state = self.get_last_known_state()
-            txn = await self.get_account_transaction(address, seq, True)
+            # check transaction existence without events and parsing result, until it is found.
+            found = await self.execute("get_account_transaction", [address_hex, int(seq), False], bool)
+            txn = await self.get_account_transaction(address_hex, seq, True) if found else None
             if txn is not None:
-                if txn.hash != txn_hash:
+                if txn.hash.lower() != expected_hash:
                     raise TransactionHashMismatchError(txn, txn_hash)
                 if txn.vm_status.type != VM_STATUS_EXECUTED:
                     raise TransactionExecutionFailed(txn)
                 return txn
             if expiration_time_secs * 1_000_000 <= state.timestamp_usecs:
                 raise TransactionExpired(state, expiration_time_secs)
-            await asyncio.sleep(wait_duration_secs or DEFAULT_WAIT_FOR_TRANSACTION_WAIT_DURATION_SECS)
+            if wait_duration_secs is None:
+                # compare the state updated by the calls above, the state got before them is stale
+                timestamp_usecs = self.get_last_known_state().timestamp_usecs
+                advanced = prev_timestamp_usecs is None or timestamp_usecs > prev_timestamp_usecs
+                interval = min(
+                    DEFAULT_WAIT_FOR_TRANSACTION_MAX_WAIT_DURATION_SECS,
+                    max(DEFAULT_WAIT_FOR_TRANSACTION_MIN_WAIT_DURATION_SECS, interval * (0.7 if advanced else 1.5)),
+                )
+                prev_timestamp_usecs = timestamp_usecs
+            await asyncio.sleep(wait_duration_secs or interval)
 
         raise WaitForTransactionTimeout(start_time, time.time())
 
@@ -558,12 +637,7 @@ class AsyncClient:
         Raises NetworkError if send http request failed, or received server response status is not 200.
         """
 
-        request = {
-            "jsonrpc": "2.0",
-            "id": 1,
-            "method": method,
-            "params": params or [],
-        }
+        request = REQUEST_TEMPLATE % (orjson.dumps(method), orjson.dumps(params or []))
         try:
             json = await self._rs.send_request(self, request, ignore_stale_response or False)
             if "error" in json:
@@ -582,18 +656,19 @@ class AsyncClient:
     async def _send_http_request(
         self,
         url: str,
-        request: typing.Dict[str, typing.Any],
+        request: bytes,
         ignore_stale_response: bool,
     ) -> typing.Dict[str, typing.Any]:
         self._logger.debug("http request body: %s", request)
-        headers = {"User-Agent": USER_AGENT_HTTP_HEADER}
-        async with self._session.post(url, json=request, headers=headers) as response:
-            self._logger.debug("http response body: %s", response.text)
+        headers = {"User-Agent": USER_AGENT_HTTP_HEADER, "Content-Type": "application/json"}
+        async with self._session.post(url, data=request, headers=headers) as response:
+            body = await response.read()
+            self._logger.debug("http response body: %s", body)
             response.raise_for_status()
             try:
-                json = await response.json()
-            except ValueError as e:
-                raise InvalidServerResponse(f"Parse response as json failed: {e}, response: {response.text}")
+                json = orjson.loads(body)
+            except orjson.JSONDecodeError as e:
+                raise InvalidServerResponse(f"Parse response as json failed: {e}, response: {body!r}")
 
         # check stable response before check jsonrpc error
         try:
@@ -607,12 +682,3 @@ class AsyncClient:
                 raise e
 
         return json
-
-
-def _parse_obj(factory):  # pyre-ignore
-    return lambda result: parser.ParseDict(result, factory(), ignore_unknown_fields=True) if result else None
-
-
-def _parse_list(factory):  # pyre-ignore
-    parser = _parse_obj(factory)
-    return lambda result: list(map(parser, result)) if result else []
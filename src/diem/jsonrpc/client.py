@@ -3,16 +3,23 @@
 
 
 import time
-import copy
 import dataclasses
 import google.protobuf.json_format as parser
+import orjson
 import requests
+import urllib3
 import threading
 import typing
 import random
+import contextlib
+import io
 
-from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from requests.adapters import HTTPAdapter
 from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+from google.protobuf.descriptor import Descriptor, FieldDescriptor
+from google.protobuf.message import Message
 from logging import Logger, getLogger
 
 from diem import diem_types, utils, TREASURY_ADDRESS
@@ -23,11 +30,16 @@ from diem.jsonrpc.constants import (
     VM_STATUS_EXECUTED,
     DEFAULT_CONNECT_TIMEOUT_SECS,
     DEFAULT_TIMEOUT_SECS,
+    DEFAULT_HTTP_POOL_SIZE,
     DEFAULT_MAX_RETRIES,
     DEFAULT_RETRY_DELAY,
+    DEFAULT_RETRY_MAX_DELAY_SECS,
     DEFAULT_WAIT_FOR_TRANSACTION_TIMEOUT_SECS,
-    DEFAULT_WAIT_FOR_TRANSACTION_WAIT_DURATION_SECS,
+    DEFAULT_WAIT_FOR_TRANSACTION_MIN_WAIT_DURATION_SECS,
+    DEFAULT_WAIT_FOR_TRANSACTION_MAX_WAIT_DURATION_SECS,
     USER_AGENT_HTTP_HEADER,
+    REQUEST_TEMPLATE,
+    MAX_PARENT_VASP_ACCOUNT_LOOKUPS,
 )
 from diem.jsonrpc.errors import (
     JsonRpcError,
@@ -42,12 +54,23 @@ from diem.jsonrpc.errors import (
 )
 from diem.jsonrpc.state import State
 
+try:
+    # urllib3 adds "br" when brotli is installed, as it can decode brotli compressed response
+    from urllib3.util.request import ACCEPT_ENCODING
+except ImportError:
+    ACCEPT_ENCODING = "gzip,deflate"
+
+
+# a single response object, or a list of them for batch requests
+JsonRpcResponse = typing.Union[typing.Dict[str, typing.Any], typing.List[typing.Dict[str, typing.Any]]]
+
 
 @dataclasses.dataclass
 class Retry:
     max_retries: int
     delay_secs: float
     exception: typing.Type[Exception]
+    cap_secs: float = DEFAULT_RETRY_MAX_DELAY_SECS
 
     def execute(self, fn: typing.Callable):  # pyre-ignore
         tries = 0
@@ -57,21 +80,74 @@ class Retry:
                 return fn()
             except self.exception as e:
                 if tries < self.max_retries:
-                    # simplest backoff strategy: tries * delay
-                    time.sleep(self.delay_secs * tries)
+                    time.sleep(utils.backoff_delay_secs(tries, self.delay_secs, self.cap_secs))
                 else:
                     raise e
 
 
+@dataclasses.dataclass
+class RPCCacheConfig:
+    """RPCCacheConfig configures the in-memory cache for read-only JSON-RPC calls
+
+    Calls with deterministic results are cached:
+
+    1. get_metadata with version
+    2. get_account_state_with_proof with ledger_version
+    3. get_transactions for versions committed before the last known server state version
+
+    get_currencies is also cached, but its result changes (e.g. `to_xdx_exchange_rate`), hence it may
+    be stale for up to `ttl_secs`.
+    get_state_proof is not cached, because it returns proof for the latest ledger of the server.
+
+    Cached results are parsed objects shared by all callers, hence they should not be modified.
+    """
+
+    enabled: bool = False
+    maxsize: int = 10000
+    ttl_secs: float = 300.0
+
+
+class _TTLCache:
+    """Thread-safe LRU cache, items expire after ttl_secs"""
+
+    def __init__(self, maxsize: int, ttl_secs: float) -> None:
+        self._maxsize = maxsize
+        self._ttl_secs = ttl_secs
+        self._items: "OrderedDict[typing.Any, typing.Tuple[float, typing.Any]]" = OrderedDict()  # pyre-ignore
+        self._lock = threading.Lock()
+
+    def get(self, key: typing.Any) -> typing.Any:  # pyre-ignore
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expire_at, value = item
+            if expire_at <= time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: typing.Any, value: typing.Any) -> None:  # pyre-ignore
+        with self._lock:
+            self._items[key] = (time.monotonic() + self._ttl_secs, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self._maxsize:
+                self._items.popitem(last=False)
+
+
 class RequestStrategy:
     """RequestStrategy base class
 
     It implements the simplest strategy: direct send http request
+
+    `request` is the JSON-encoded request body in bytes, a single request object or a list of them for
+    batch requests; it was a request object (dict) in previous versions, subclasses reading request fields
+    should decode it by `json.loads(request)` first. The response is the decoded JSON response, a single
+    response object or a list of them for batch requests.
     """
 
-    def send_request(
-        self, client: "Client", request: typing.Dict[str, typing.Any], ignore_stale_response: bool
-    ) -> typing.Dict[str, typing.Any]:
+    def send_request(self, client: "Client", request: bytes, ignore_stale_response: bool) -> JsonRpcResponse:
         return client._send_http_request(client._url, request, ignore_stale_response)
 
 
@@ -118,31 +194,177 @@ class RequestWithBackups(RequestStrategy):
         self._executor = executor
         self._fallback = fallback
 
-    def send_request(
-        self, client: "Client", request: typing.Dict[str, typing.Any], ignore_stale_response: bool
-    ) -> typing.Dict[str, typing.Any]:
-        primary = self._executor.submit(client._send_http_request, client._url, request, ignore_stale_response)
+    def send_request(self, client: "Client", request: bytes, ignore_stale_response: bool) -> JsonRpcResponse:
+        # set once a response is picked, so that the losing request is skipped if it is not sent yet
+        done = threading.Event()
+        primary = self._executor.submit(self._send, done, client, client._url, request, ignore_stale_response)
         backup = self._executor.submit(
-            client._send_http_request, random.choice(self._backups), request, ignore_stale_response
+            self._send, done, client, random.choice(self._backups), request, ignore_stale_response
         )
 
-        if self._fallback:
-            return self._fallback_to_backup(primary, backup)
-        return self._first_success(primary, backup)
+        try:
+            if self._fallback:
+                return self._fallback_to_backup(primary, backup)
+            return self._first_success(primary, backup)
+        finally:
+            done.set()
+
+    def _send(
+        self,
+        done: threading.Event,
+        client: "Client",
+        url: str,
+        request: bytes,
+        ignore_stale_response: bool,
+    ) -> JsonRpcResponse:
+        if done.is_set():
+            raise CancelledError()
+        return client._send_http_request(url, request, ignore_stale_response)
 
-    def _fallback_to_backup(self, primary: Future, backup: Future) -> typing.Dict[str, typing.Any]:
+    def _fallback_to_backup(self, primary: Future, backup: Future) -> JsonRpcResponse:
         try:
-            return primary.result()
+            ret = primary.result()
         except Exception:
             return backup.result()
+        backup.cancel()
+        return ret
 
-    def _first_success(self, primary: Future, backup: Future) -> typing.Dict[str, typing.Any]:
-        futures = as_completed({primary, backup})
-        first = next(futures)
+    def _first_success(self, primary: Future, backup: Future) -> JsonRpcResponse:
+        done, not_done = wait({primary, backup}, return_when=FIRST_COMPLETED)
+        first = done.pop()
         try:
-            return first.result()
+            ret = first.result()
         except Exception:
-            return next(futures).result()
+            return (not_done.pop() if not_done else done.pop()).result()
+        for future in not_done:
+            future.cancel()
+        return ret
+
+
+# sent with each JSON-RPC request, so that the default headers of a caller provided session or client are kept
+_JSON_CONTENT_TYPE_HEADER: typing.Dict[str, str] = {"Content-Type": "application/json"}
+
+
+class Transport:
+    """Transport base class
+
+    Transport sends JSON-RPC request body by HTTP POST, and returns response body.
+    Implementations must raise NetworkError if sending the request or reading the response failed, or
+    the response status is not success; `Client` only converts `requests` errors, other HTTP client
+    errors escape as they are.
+    """
+
+    def post(self, url: str, body: bytes, timeout: typing.Tuple[float, float]) -> bytes:
+        raise NotImplementedError()
+
+    def post_stream(
+        self, url: str, body: bytes, timeout: typing.Tuple[float, float]
+    ) -> typing.ContextManager[typing.BinaryIO]:
+        """returns a context manager of a file-like object for reading response body incrementally
+
+        The default implementation reads the whole response body by `post`.
+        """
+
+        return contextlib.nullcontext(io.BytesIO(self.post(url, body, timeout)))
+
+
+class RequestsTransport(Transport):
+    """RequestsTransport sends HTTP/1.1 requests by `requests.Session`
+
+    The default `requests.HTTPAdapter` keeps at most 10 connections per host, connections over the
+    limit are closed after used, which defeats keep-alive when sending concurrent requests (e.g.
+    `RequestWithBackups` with a large executor).
+    When no `session` is given, adapters with `pool_size` connections are mounted for http and https,
+    and each of the given urls, so that each server keeps its own connection pool; a caller provided
+    `session` is used as it is configured.
+
+    JSON-RPC responses are highly compressible, install `brotli` for accepting brotli compressed responses
+    in addition to gzip and deflate; the `Accept-Encoding` header is set on the created session only.
+    """
+
+    def __init__(
+        self,
+        session: typing.Optional[requests.Session] = None,
+        pool_size: int = DEFAULT_HTTP_POOL_SIZE,
+        urls: typing.Sequence[str] = (),
+    ) -> None:
+        if session is None:
+            session = requests.Session()
+            pool_size = max(10, pool_size)
+            for url in ["https://", "http://", *urls]:
+                session.mount(
+                    url,
+                    HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=False, max_retries=0),
+                )
+            session.headers.update({"Connection": "keep-alive", "Accept-Encoding": ACCEPT_ENCODING})
+        self._session: requests.Session = session
+        self._session.headers.update({"User-Agent": USER_AGENT_HTTP_HEADER})
+
+    def post(self, url: str, body: bytes, timeout: typing.Tuple[float, float]) -> bytes:
+        try:
+            response = self._session.post(url, data=body, headers=_JSON_CONTENT_TYPE_HEADER, timeout=timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            raise NetworkError(f"Error in connecting to server: {e}\nPlease retry...")
+        return response.content
+
+    @contextlib.contextmanager
+    def post_stream(
+        self, url: str, body: bytes, timeout: typing.Tuple[float, float]
+    ) -> typing.Iterator[typing.BinaryIO]:
+        try:
+            with self._session.post(
+                url, data=body, headers=_JSON_CONTENT_TYPE_HEADER, timeout=timeout, stream=True
+            ) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                yield response.raw
+        except (requests.RequestException, urllib3.exceptions.HTTPError) as e:
+            # urllib3 errors are raised while reading `response.raw`
+            raise NetworkError(f"Error in connecting to server: {e}\nPlease retry...")
+
+
+class HTTPXTransport(Transport):
+    """HTTPXTransport sends HTTP/2 requests by `httpx.Client`, requires `httpx[http2]` installed
+
+    HTTP/2 multiplexes concurrent requests to same server over one connection, hence concurrent requests
+    (e.g. `RequestWithBackups`, `Client.get_vasp_domain_map`) share one TCP / TLS handshake.
+
+    ```python
+    from diem import jsonrpc
+
+    client = jsonrpc.Client(<json-rpc-server-url>, transport=jsonrpc.HTTPXTransport())
+    ```
+    """
+
+    def __init__(
+        self,
+        client: typing.Optional[typing.Any] = None,  # pyre-ignore: httpx.Client, httpx is an optional dependency
+        max_keepalive_connections: int = DEFAULT_HTTP_POOL_SIZE,
+        max_connections: int = DEFAULT_HTTP_POOL_SIZE * 2,
+    ) -> None:
+        import httpx
+
+        self._httpx = httpx  # pyre-ignore
+        self._client = client or httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=max_keepalive_connections, max_connections=max_connections),
+        )
+        self._client.headers.update({"User-Agent": USER_AGENT_HTTP_HEADER})
+
+    def post(self, url: str, body: bytes, timeout: typing.Tuple[float, float]) -> bytes:
+        connect_timeout, read_timeout = timeout
+        try:
+            response = self._client.post(
+                url,
+                content=body,
+                headers=_JSON_CONTENT_TYPE_HEADER,
+                timeout=self._httpx.Timeout(read_timeout, connect=connect_timeout),
+            )
+            response.raise_for_status()
+        except self._httpx.HTTPError as e:
+            raise NetworkError(f"Error in connecting to server: {e}\nPlease retry...")
+        return response.content
 
 
 class Client:
@@ -159,16 +381,28 @@ class Client:
         retry: typing.Optional[Retry] = None,
         rs: typing.Optional[RequestStrategy] = None,
         logger: typing.Optional[Logger] = None,
+        http_pool_size: int = DEFAULT_HTTP_POOL_SIZE,
+        cache: typing.Optional[RPCCacheConfig] = None,
+        transport: typing.Optional[Transport] = None,
     ) -> None:
+        """`session` and `http_pool_size` are used for creating the default `RequestsTransport`,
+        they are ignored when `transport` is provided."""
+
         self._url: str = server_url
-        self._session: requests.Session = session or requests.Session()
-        self._session.headers.update({"User-Agent": USER_AGENT_HTTP_HEADER})
         self._timeout: typing.Tuple[float, float] = timeout or (DEFAULT_CONNECT_TIMEOUT_SECS, DEFAULT_TIMEOUT_SECS)
         self._last_known_server_state: State = State(chain_id=-1, version=-1, timestamp_usecs=-1)
         self._lock = threading.Lock()
         self._retry: Retry = retry or Retry(DEFAULT_MAX_RETRIES, DEFAULT_RETRY_DELAY, StaleResponseError)
         self._rs: RequestStrategy = rs or RequestStrategy()
         self._logger: Logger = logger or getLogger(__name__)
+        cache = cache or RPCCacheConfig()
+        self._cache: typing.Optional[_TTLCache] = _TTLCache(cache.maxsize, cache.ttl_secs) if cache.enabled else None
+        if transport is None:
+            urls = [server_url]
+            if isinstance(self._rs, RequestWithBackups):
+                urls += self._rs._backups
+            transport = RequestsTransport(session, http_pool_size, urls)
+        self._transport: Transport = transport
 
     # high level functions
 
@@ -185,15 +419,18 @@ class Client:
         could not find the account by the parent_vasp_address found in ChildVASP account.
         """
 
-        account = self.must_get_account(vasp_account_address)
-
-        if account.role.type == ACCOUNT_ROLE_PARENT_VASP:
-            return account
-        if account.role.type == ACCOUNT_ROLE_CHILD_VASP:
-            return self.get_parent_vasp_account(account.role.parent_vasp_address)
+        address = vasp_account_address
+        for _ in range(MAX_PARENT_VASP_ACCOUNT_LOOKUPS):
+            account = self.must_get_account(address)
+            if account.role.type == ACCOUNT_ROLE_PARENT_VASP:
+                return account
+            if account.role.type != ACCOUNT_ROLE_CHILD_VASP:
+                hex = utils.account_address_hex(address)
+                raise ValueError(f"given account address({hex}) is not a VASP account: {account}")
+            address = account.role.parent_vasp_address
 
         hex = utils.account_address_hex(vasp_account_address)
-        raise ValueError(f"given account address({hex}) is not a VASP account: {account}")
+        raise ValueError(f"could not find parent VASP account by following parent_vasp_address from {hex}")
 
     def get_base_url_and_compliance_key(
         self, account_address: typing.Union[diem_types.AccountAddress, str]
@@ -203,15 +440,18 @@ class Client:
         ParentVASP or Designated Dealer account role has base_url and compliance key setup, which
         are used for offchain API communication.
         """
-        account = self.must_get_account(account_address)
-
-        if account.role.compliance_key and account.role.base_url:
-            key = Ed25519PublicKey.from_public_bytes(bytes.fromhex(account.role.compliance_key))
-            return (account.role.base_url, key)
-        if account.role.parent_vasp_address:
-            return self.get_base_url_and_compliance_key(account.role.parent_vasp_address)
-
-        raise ValueError(f"could not find base_url and compliance_key from account: {account}")
+        address = account_address
+        for _ in range(MAX_PARENT_VASP_ACCOUNT_LOOKUPS):
+            account = self.must_get_account(address)
+            if account.role.compliance_key and account.role.base_url:
+                key = Ed25519PublicKey.from_public_bytes(bytes.fromhex(account.role.compliance_key))
+                return (account.role.base_url, key)
+            if not account.role.parent_vasp_address:
+                raise ValueError(f"could not find base_url and compliance_key from account: {account}")
+            address = account.role.parent_vasp_address
+
+        hex = utils.account_address_hex(account_address)
+        raise ValueError(f"could not find base_url and compliance_key by following parent_vasp_address from {hex}")
 
     def must_get_account(self, account_address: typing.Union[diem_types.AccountAddress, str]) -> rpc.Account:
         """must_get_account raises AccountNotFoundError if account could not be found by given address"""
@@ -246,10 +486,11 @@ class Client:
         Returns a state with all -1 values if the client never called server after initialized.
         Last known state is used for tracking server response, making sure we won't hit stale
         server.
+        State is immutable, the last known state is replaced (not modified) when it is updated,
+        hence it is safe to return it without locking.
         """
 
-        with self._lock:
-            return copy.copy(self._last_known_server_state)
+        return self._last_known_server_state
 
     def update_last_known_state(self, chain_id: int, version: int, timestamp_usecs: int) -> None:
         """update last known server state
@@ -259,6 +500,11 @@ class Client:
         Raises StaleResponseError if version or timestamp_usecs is less than previous values
         """
 
+        # State is immutable, when it is same with the given values, there is nothing to check or update.
+        curr = self._last_known_server_state
+        if curr.chain_id == chain_id and curr.version == version and curr.timestamp_usecs == timestamp_usecs:
+            return
+
         with self._lock:
             curr = self._last_known_server_state
             if curr.chain_id != -1 and curr.chain_id != chain_id:
@@ -357,6 +603,20 @@ class Client:
         params = [int(start_version), int(limit), bool(include_events)]
         return self.execute("get_transactions", params, _parse_list(lambda: rpc.Transaction()))
 
+    def iter_transactions(
+        self,
+        start_version: int,
+        limit: int,
+        include_events: typing.Optional[bool] = None,
+    ) -> typing.Iterator[rpc.Transaction]:
+        """iterate transactions while reading server response
+
+        Same with `get_transactions`, but parses response incrementally, see `execute_stream` for details.
+        """
+
+        params = [int(start_version), int(limit), bool(include_events)]
+        return self.execute_stream("get_transactions", params, _parse_obj(lambda: rpc.Transaction()))
+
     def get_events(self, event_stream_key: str, start: int, limit: int) -> typing.List[rpc.Event]:
         """get events
 
@@ -382,22 +642,34 @@ class Client:
         params = [address, version, ledger_version]
         return self.execute("get_account_state_with_proof", params, _parse_obj(lambda: rpc.AccountStateWithProof()))
 
-    def get_vasp_domain_map(self, batch_size: int = 100) -> typing.Dict[str, str]:
+    def get_vasp_domain_map(self, batch_size: int = 100, batches_per_request: int = 10) -> typing.Dict[str, str]:
+        """get VASP domain map by reading all VASP domain events from treasury compliance account
+
+        The first batch of events is fetched by one call; when there are more events, the following
+        batches are fetched by batch requests, each contains `batches_per_request` get_events calls.
+        """
+
         domain_map = {}
         event_index = 0
         tc_account = self.must_get_account(utils.account_address(TREASURY_ADDRESS))
         event_stream_key = tc_account.role.vasp_domain_events_key
+        events_parser = _parse_list(lambda: rpc.Event())
+        num_batches = 1
         while True:
-            events = self.get_events(event_stream_key, event_index, batch_size)
-            for event in events:
-                if event.data.removed:
-                    del domain_map[event.data.domain]
-                else:
-                    domain_map[event.data.domain] = event.data.address
-            if len(events) < batch_size:
-                break
-            event_index += batch_size
-        return domain_map
+            calls = [
+                ("get_events", [event_stream_key, event_index + i * batch_size, batch_size], events_parser)
+                for i in range(num_batches)
+            ]
+            for events in self.batch_execute(calls):
+                for event in events:
+                    if event.data.removed:
+                        del domain_map[event.data.domain]
+                    else:
+                        domain_map[event.data.domain] = event.data.address
+                if len(events) < batch_size:
+                    return domain_map
+                event_index += batch_size
+            num_batches = batches_per_request
 
     def support_diem_id(self) -> bool:
         tc_account = self.must_get_account(TREASURY_ADDRESS)
@@ -495,10 +767,19 @@ class Client:
         number, but the transaction hash does not match the transactoin hash given in parameter.
         This means the executed transaction is from another process (which submitted transaction
         with same account address and sequence).
+
+        Polls the transaction every `wait_duration_secs` if it is provided; otherwise the polling interval
+        adapts to the server: it shrinks while new blocks are committed, and grows when the server state
+        does not change.
         """
         start_time = time.time()
-        max_wait = start_time + (timeout_secs or DEFAULT_WAIT_FOR_TRANSACTION_TIMEOUT_SECS)
-        while time.time() < max_wait:
+        # wall clock time may jump, only use it for reporting timeout
+        max_wait = time.monotonic() + (timeout_secs or DEFAULT_WAIT_FOR_TRANSACTION_TIMEOUT_SECS)
+        interval = DEFAULT_WAIT_FOR_TRANSACTION_MIN_WAIT_DURATION_SECS
+        prev_timestamp_usecs = None
+        address_hex = utils.account_address_hex(address)
+        expected_hash = txn_hash.lower()
+        while time.monotonic() < max_wait:
             # Get last known state first before making `get_account_transaction` call,
             # so that we know for sure there is no transaction we are waiting for before
             # the state timestamp.
@@ -512,16 +793,27 @@ class Client:
             #       the transaction is included in the missed `n` transactions, we will raise
             #       unexpected TransactionExpired error.
             state = self.get_last_known_state()
-            txn = self.get_account_transaction(address, seq, True)
+            # check transaction existence without events and parsing result, until it is found.
+            found = self.execute("get_account_transaction", [address_hex, int(seq), False], bool)
+            txn = self.get_account_transaction(address_hex, seq, True) if found else None
             if txn is not None:
-                if txn.hash != txn_hash:
+                if txn.hash.lower() != expected_hash:
                     raise TransactionHashMismatchError(txn, txn_hash)
                 if txn.vm_status.type != VM_STATUS_EXECUTED:
                     raise TransactionExecutionFailed(txn)
                 return txn
             if expiration_time_secs * 1_000_000 <= state.timestamp_usecs:
                 raise TransactionExpired(state, expiration_time_secs)
-            time.sleep(wait_duration_secs or DEFAULT_WAIT_FOR_TRANSACTION_WAIT_DURATION_SECS)
+            if wait_duration_secs is None:
+                # compare the state updated by the calls above, the state got before them is stale
+                timestamp_usecs = self.get_last_known_state().timestamp_usecs
+                advanced = prev_timestamp_usecs is None or timestamp_usecs > prev_timestamp_usecs
+                interval = min(
+                    DEFAULT_WAIT_FOR_TRANSACTION_MAX_WAIT_DURATION_SECS,
+                    max(DEFAULT_WAIT_FOR_TRANSACTION_MIN_WAIT_DURATION_SECS, interval * (0.7 if advanced else 1.5)),
+                )
+                prev_timestamp_usecs = timestamp_usecs
+            time.sleep(wait_duration_secs or interval)
 
         raise WaitForTransactionTimeout(start_time, time.time())
 
@@ -537,11 +829,38 @@ class Client:
 
         This method handles StableResponseError with retry.
         Should only be called by get methods.
+        Results of deterministic read-only calls are cached if cache is enabled, see `RPCCacheConfig`.
         """
 
-        return self._retry.execute(
+        key = self._cache_key(method, params)
+        if key is not None:
+            ret = self._cache.get(key)  # pyre-ignore
+            if ret is not None:
+                return ret
+
+        ret = self._retry.execute(
             lambda: self.execute_without_retry(method, params, result_parser, ignore_stale_response)
         )
+        if key is not None and ret is not None:
+            self._cache.set(key, ret)  # pyre-ignore
+        return ret
+
+    def _cache_key(
+        self, method: str, params: typing.List[typing.Any]  # pyre-ignore
+    ) -> typing.Optional[typing.Tuple[str, bytes]]:
+        if self._cache is None:
+            return None
+        if method == "get_currencies":
+            cacheable = True
+        elif method == "get_metadata":
+            cacheable = bool(params)
+        elif method == "get_account_state_with_proof":
+            cacheable = params[2] is not None
+        elif method == "get_transactions":
+            cacheable = params[0] + params[1] <= self._last_known_server_state.version
+        else:
+            cacheable = False
+        return (method, orjson.dumps(params)) if cacheable else None
 
     # pyre-ignore
     def execute_without_retry(
@@ -564,62 +883,345 @@ class Client:
         Raises NetworkError if send http request failed, or received server response status is not 200.
         """
 
-        request = {
-            "jsonrpc": "2.0",
-            "id": 1,
-            "method": method,
-            "params": params or [],
-        }
+        request = REQUEST_TEMPLATE % (orjson.dumps(method), orjson.dumps(params or []))
         try:
             json = self._rs.send_request(self, request, ignore_stale_response or False)
-            if "error" in json:
-                err = json["error"]
-                raise JsonRpcError(f"{err}")
+            return self._handle_response(json, result_parser)
+        except requests.RequestException as e:
+            # transports raise NetworkError, custom RequestStrategy may still send requests by `requests` directly
+            raise NetworkError(f"Error in connecting to server: {e}\nPlease retry...")
+        except parser.ParseError as e:
+            raise InvalidServerResponse(f"Parse result failed: {e}, response: {json}")
 
-            if "result" in json:
-                if result_parser:
-                    return result_parser(json["result"])
-                return
+    def execute_stream(
+        self,
+        method: str,
+        params: typing.List[typing.Any],  # pyre-ignore
+        item_parser: typing.Callable[[typing.Dict[str, typing.Any]], typing.Any],  # pyre-ignore
+        ignore_stale_response: typing.Optional[bool] = None,
+    ) -> typing.Iterator[typing.Any]:  # pyre-ignore
+        """execute JSON-RPC method call that returns a list, and parse result items while reading response
+
+        Items are parsed by `item_parser` and yielded one by one, so that large responses (e.g. get_transactions
+        with events) are not loaded into memory at once. Requires `ijson` installed.
+
+        Different with `execute`, this method sends request to primary server only and does not retry,
+        because yielded items can't be taken back. For the same reason, server state is checked after
+        all items are yielded: StaleResponseError is raised at the end if ignore_stale_response is not True.
+
+        Raises same errors with `execute_without_retry`.
+        """
+
+        import ijson
+
+        request = REQUEST_TEMPLATE % (orjson.dumps(method), orjson.dumps(params or []))
+        self._logger.debug("http request body: %s", request)
+        response = _StreamResponse(ijson.ObjectBuilder)
+        try:
+            with self._transport.post_stream(self._url, request, self._timeout) as f:
+                for prefix, event, value in ijson.parse(f, use_float=True):
+                    item = response.event(prefix, event, value)
+                    if item is not None:
+                        yield item_parser(item)
+        except ijson.JSONError as e:
+            raise InvalidServerResponse(f"Parse response as json failed: {e}")
+        except parser.ParseError as e:
+            raise InvalidServerResponse(f"Parse result failed: {e}")
+
+        try:
+            self.update_last_known_state(*response.server_state())
+        except StaleResponseError as e:
+            if not ignore_stale_response:
+                raise e
+
+    # pyre-ignore
+    def batch_execute(
+        self,
+        calls: typing.List[typing.Tuple[str, typing.List[typing.Any], typing.Optional[typing.Callable]]],  # pyre-ignore
+        ignore_stale_response: typing.Optional[bool] = None,
+    ) -> typing.List[typing.Any]:  # pyre-ignore
+        """execute JSON-RPC method calls in one batch request
+
+        Each call is a tuple of method name, params and an optional result parser, results are returned
+        in the same order of the given calls.
+
+        This method handles StableResponseError with retry, and raises same errors with `execute_without_retry`;
+        JsonRpcError is raised if any of the calls failed.
+        See [JSON-RPC SPEC 2.0 Batch](https://www.jsonrpc.org/specification#batch) for more details.
+        """
+
+        return self._retry.execute(lambda: self._batch_execute_without_retry(calls, ignore_stale_response))
 
-            raise InvalidServerResponse(f"No error or result in response: {json}")
+    # pyre-ignore
+    def _batch_execute_without_retry(
+        self,
+        calls: typing.List[typing.Tuple[str, typing.List[typing.Any], typing.Optional[typing.Callable]]],  # pyre-ignore
+        ignore_stale_response: typing.Optional[bool] = None,
+    ) -> typing.List[typing.Any]:  # pyre-ignore
+        request = orjson.dumps(
+            [
+                {"jsonrpc": "2.0", "id": i, "method": method, "params": params or []}
+                for i, (method, params, _) in enumerate(calls)
+            ]
+        )
+        try:
+            json = self._rs.send_request(self, request, ignore_stale_response or False)
+            if not isinstance(json, list):
+                if "error" in json:
+                    raise JsonRpcError(f"{json['error']}")
+                raise InvalidServerResponse(f"Expect batch response, but got: {json}")
+
+            responses = {resp.get("id"): resp for resp in json}
+            ret = []
+            for i, (_, _, result_parser) in enumerate(calls):
+                if i not in responses:
+                    raise InvalidServerResponse(f"No response for request id {i} in batch response: {json}")
+                ret.append(self._handle_response(responses[i], result_parser))
+            return ret
         except requests.RequestException as e:
+            # transports raise NetworkError, custom RequestStrategy may still send requests by `requests` directly
             raise NetworkError(f"Error in connecting to server: {e}\nPlease retry...")
         except parser.ParseError as e:
             raise InvalidServerResponse(f"Parse result failed: {e}, response: {json}")
 
+    # pyre-ignore
+    def _handle_response(
+        self,
+        json: typing.Dict[str, typing.Any],
+        result_parser: typing.Optional[typing.Callable] = None,  # pyre-ignore
+    ):
+        if "error" in json:
+            err = json["error"]
+            raise JsonRpcError(f"{err}")
+
+        if "result" in json:
+            if result_parser:
+                return result_parser(json["result"])
+            return
+
+        raise InvalidServerResponse(f"No error or result in response: {json}")
+
     def _send_http_request(
         self,
         url: str,
-        request: typing.Dict[str, typing.Any],
+        request: bytes,
         ignore_stale_response: bool,
-    ) -> typing.Dict[str, typing.Any]:
+    ) -> JsonRpcResponse:
         self._logger.debug("http request body: %s", request)
-        response = self._session.post(url, json=request, timeout=self._timeout)
-        self._logger.debug("http response body: %s", response.text)
-        response.raise_for_status()
+        body = self._transport.post(url, request, self._timeout)
+        self._logger.debug("http response body: %s", body)
         try:
-            json = response.json()
-        except ValueError as e:
-            raise InvalidServerResponse(f"Parse response as json failed: {e}, response: {response.text}")
+            json = orjson.loads(body)
+        except orjson.JSONDecodeError as e:
+            raise InvalidServerResponse(f"Parse response as json failed: {e}, response: {body!r}")
 
         # check stable response before check jsonrpc error
-        try:
-            self.update_last_known_state(
-                json.get("diem_chain_id"),
-                json.get("diem_ledger_version"),
-                json.get("diem_ledger_timestampusec"),
-            )
-        except StaleResponseError as e:
-            if not ignore_stale_response:
-                raise e
+        for resp in json if isinstance(json, list) else [json]:
+            try:
+                self.update_last_known_state(
+                    resp.get("diem_chain_id"),
+                    resp.get("diem_ledger_version"),
+                    resp.get("diem_ledger_timestampusec"),
+                )
+            except StaleResponseError as e:
+                if not ignore_stale_response:
+                    raise e
 
         return json
 
 
+# response fields of server state, in the order of `Client.update_last_known_state` arguments
+_STATE_FIELDS: typing.Tuple[str, str, str] = ("diem_chain_id", "diem_ledger_version", "diem_ledger_timestampusec")
+
+
+class _StreamResponse:
+    """_StreamResponse consumes ijson parse events of a JSON-RPC response with list result
+
+    It collects keys and server state fields of the response object, and builds `result` items and
+    `error` object by the given ijson object builder factory.
+    """
+
+    def __init__(self, builder_factory: typing.Callable[[], typing.Any]) -> None:  # pyre-ignore
+        self._keys: typing.Set[str] = set()
+        self._state: typing.Dict[str, typing.Any] = {}  # pyre-ignore
+        self._builder_factory = builder_factory
+        self._builder = None  # pyre-ignore
+        self._builder_prefix: typing.Optional[str] = None
+
+    def event(self, prefix: str, event: str, value: typing.Any) -> typing.Optional[typing.Any]:  # pyre-ignore
+        """returns the result item when its building is completed, otherwise returns None
+
+        Raises JsonRpcError when the error object is completed, and InvalidServerResponse if result is not a list.
+        """
+
+        if self._builder is None:
+            self._track(prefix, event, value)
+        if self._builder is None:
+            return None
+
+        self._builder.event(event, value)
+        if prefix != self._builder_prefix or event != "end_map":
+            return None
+        item, self._builder = self._builder.value, None
+        if prefix == "error":
+            raise JsonRpcError(f"{item}")
+        return item
+
+    def server_state(self) -> typing.List[typing.Any]:  # pyre-ignore
+        """returns server state fields in the order of `Client.update_last_known_state` arguments
+
+        Raises InvalidServerResponse if the response has no result.
+        """
+
+        if "result" not in self._keys:
+            raise InvalidServerResponse(f"No error or result in response, keys: {self._keys}")
+        return [self._state.get(field) for field in _STATE_FIELDS]
+
+    def _track(self, prefix: str, event: str, value: typing.Any) -> None:  # pyre-ignore
+        if prefix == "" and event == "map_key":
+            self._keys.add(value)
+        elif prefix in _STATE_FIELDS:
+            self._state[prefix] = value
+        elif prefix == "result" and event not in ("start_array", "end_array"):
+            raise InvalidServerResponse(f"Expect result to be a list, but got JSON event: {event}")
+        elif prefix in ("result.item", "error") and event == "start_map":
+            self._builder, self._builder_prefix = self._builder_factory(), prefix
+
+
 def _parse_obj(factory):  # pyre-ignore
-    return lambda result: parser.ParseDict(result, factory(), ignore_unknown_fields=True) if result else None
+    def parse(result):  # pyre-ignore
+        if not result:
+            return None
+        obj = factory()
+        try:
+            _fast_parser(obj.DESCRIPTOR)(result, obj)
+            return obj
+        except (TypeError, ValueError, AttributeError):
+            # values need conversion (e.g. uint64 in string) or invalid, let ParseDict handle it
+            return parser.ParseDict(result, factory(), ignore_unknown_fields=True)
+
+    return parse
 
 
 def _parse_list(factory):  # pyre-ignore
     parser = _parse_obj(factory)
     return lambda result: list(map(parser, result)) if result else []
+
+
+# protobuf message descriptor => compiled fast parser
+_FAST_PARSERS: typing.Dict[Descriptor, typing.Callable[[typing.Dict[str, typing.Any], Message], None]] = {}
+
+
+def _fast_parser(descriptor: Descriptor) -> typing.Callable[[typing.Dict[str, typing.Any], Message], None]:
+    fast = _FAST_PARSERS.get(descriptor)
+    if fast is None:
+        fast = _FAST_PARSERS[descriptor] = _build_fast_parser(descriptor)
+    return fast
+
+
+def _build_fast_parser(descriptor: Descriptor) -> typing.Callable[[typing.Dict[str, typing.Any], Message], None]:
+    """builds a parser merging a JSON object into a protobuf message of the given descriptor
+
+    `google.protobuf.json_format.ParseDict` looks up message descriptor for every field of every object
+    it parses; this parser resolves fields once, and sets JSON values directly.
+    It follows ParseDict(ignore_unknown_fields=True) for the field types used by JSON-RPC response types
+    (scalar, message and repeated fields), and raises TypeError, ValueError or AttributeError for values
+    need conversion or unsupported field types, callers should fallback to ParseDict.
+    """
+
+    if descriptor.full_name.startswith("google.protobuf.") or descriptor.GetOptions().map_entry:
+
+        def unsupported(js: typing.Dict[str, typing.Any], msg: Message) -> None:
+            raise TypeError(f"fast parser does not support {descriptor.full_name}")
+
+        return unsupported
+
+    # same with ParseDict, JSON name takes precedence over field name
+    fields = dict(descriptor.fields_by_name)
+    fields.update((f.json_name, f) for f in descriptor.fields)
+    setters = {name: _field_setter(field) for name, field in fields.items()}
+
+    def parse(js: typing.Dict[str, typing.Any], msg: Message) -> None:
+        for name, value in js.items():
+            setter = setters.get(name)
+            if setter:
+                setter(msg, value)
+
+    return parse
+
+
+def _field_setter(field: FieldDescriptor) -> typing.Callable[[Message, typing.Any], None]:  # pyre-ignore
+    if field.type in (FieldDescriptor.TYPE_ENUM, FieldDescriptor.TYPE_BYTES):
+
+        def set_unsupported(msg: Message, value: typing.Any) -> None:  # pyre-ignore
+            raise TypeError(f"fast parser does not support {field.full_name}")
+
+        return set_unsupported
+
+    if field.label == FieldDescriptor.LABEL_REPEATED:
+        return _repeated_field_setter(field)
+    return _singular_field_setter(field)
+
+
+def _repeated_field_setter(field: FieldDescriptor) -> typing.Callable[[Message, typing.Any], None]:  # pyre-ignore
+    name = field.name
+    if field.cpp_type == FieldDescriptor.CPPTYPE_MESSAGE:
+
+        def set_repeated_message(msg: Message, value: typing.Any) -> None:  # pyre-ignore
+            msg.ClearField(name)
+            if value is not None:
+                _check_list(field, value)
+                items = getattr(msg, name)
+                parse = _fast_parser(field.message_type)
+                for item in value:
+                    parse(item, items.add())
+
+        return set_repeated_message
+
+    def set_repeated_scalar(msg: Message, value: typing.Any) -> None:  # pyre-ignore
+        msg.ClearField(name)
+        if value is not None:
+            _check_list(field, value)
+            for item in value:
+                _check_scalar(field, item)
+            getattr(msg, name).extend(value)
+
+    return set_repeated_scalar
+
+
+def _singular_field_setter(field: FieldDescriptor) -> typing.Callable[[Message, typing.Any], None]:  # pyre-ignore
+    name = field.name
+    if field.cpp_type == FieldDescriptor.CPPTYPE_MESSAGE:
+
+        def set_message(msg: Message, value: typing.Any) -> None:  # pyre-ignore
+            if value is None:
+                msg.ClearField(name)
+                return
+            if not isinstance(value, dict):
+                raise TypeError(f"expect JSON object for {field.full_name}, but got: {value!r}")
+            sub_msg = getattr(msg, name)
+            sub_msg.SetInParent()
+            _fast_parser(field.message_type)(value, sub_msg)
+
+        return set_message
+
+    def set_scalar(msg: Message, value: typing.Any) -> None:  # pyre-ignore
+        if value is None:
+            msg.ClearField(name)
+        else:
+            _check_scalar(field, value)
+            setattr(msg, name, value)
+
+    return set_scalar
+
+
+def _check_list(field: FieldDescriptor, value: typing.Any) -> None:  # pyre-ignore
+    # protobuf extends repeated fields by any iterable (e.g. characters of a string), ParseDict requires a list
+    if not isinstance(value, list):
+        raise TypeError(f"expect JSON array for {field.full_name}, but got: {value!r}")
+
+
+def _check_scalar(field: FieldDescriptor, value: typing.Any) -> None:  # pyre-ignore
+    # protobuf accepts bool for numeric fields and int for bool fields, ParseDict accepts neither
+    if isinstance(value, bool) != (field.cpp_type == FieldDescriptor.CPPTYPE_BOOL):
+        raise TypeError(f"invalid value for {field.full_name}: {value!r}")
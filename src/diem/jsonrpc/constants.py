@@ -65,8 +65,24 @@ SCRIPT_UNKNOWN: str = "unknown"
 
 DEFAULT_CONNECT_TIMEOUT_SECS: float = 5.0
 DEFAULT_TIMEOUT_SECS: float = 30.0
+DEFAULT_HTTP_POOL_SIZE: int = 32
+DEFAULT_ASYNC_CONNECTION_LIMIT: int = 100
+DEFAULT_ASYNC_DNS_CACHE_TTL_SECS: int = 300
+DEFAULT_ASYNC_KEEPALIVE_TIMEOUT_SECS: float = 60.0
 DEFAULT_MAX_RETRIES: int = 15
 DEFAULT_RETRY_DELAY: float = 0.2
+DEFAULT_RETRY_MAX_DELAY_SECS: float = 2.0
 DEFAULT_WAIT_FOR_TRANSACTION_TIMEOUT_SECS: float = 30.0
+# Deprecated: wait_for_transaction2 adapts the polling interval between the following min and max
+# durations when `wait_duration_secs` is not provided, this is no longer used.
 DEFAULT_WAIT_FOR_TRANSACTION_WAIT_DURATION_SECS: float = 0.2
+DEFAULT_WAIT_FOR_TRANSACTION_MIN_WAIT_DURATION_SECS: float = 0.05
+DEFAULT_WAIT_FOR_TRANSACTION_MAX_WAIT_DURATION_SECS: float = 2.0
+# a ChildVASP account's parent is a ParentVASP account, following parent_vasp_address takes at most 2
+# account lookups; the limit guards against unexpected cycles.
+MAX_PARENT_VASP_ACCOUNT_LOOKUPS: int = 8
 USER_AGENT_HTTP_HEADER: str = "diem-client-sdk-python / %s" % VERSION
+
+# JSON-RPC requests only differ in method and params, formatting the JSON-encoded method and params
+# into the template saves building a request dict and serializing it for every call.
+REQUEST_TEMPLATE: bytes = b'{"jsonrpc":"2.0","id":1,"method":%s,"params":%s}'
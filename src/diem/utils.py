@@ -5,7 +5,7 @@
 
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey, Ed25519PrivateKey
-import hashlib, typing, time, socket, asyncio
+import hashlib, typing, time, socket, asyncio, random, functools
 
 from . import diem_types, jsonrpc, stdlib
 from .constants import (
@@ -39,11 +39,14 @@ def account_address(addr: typing.Union[diem_types.AccountAddress, bytes, str]) -
         raise InvalidAccountAddressError(e)
 
 
+@functools.lru_cache(maxsize=4096)
 def account_address_hex(addr: typing.Union[diem_types.AccountAddress, str]) -> str:
     """convert `diem_types.AccountAddress` into hex-encoded string
 
     This function converts given parameter into account address bytes first, then convert bytes
-    into hex-encoded string
+    into hex-encoded string.
+    Results are cached, as the same addresses are converted repeatedly by JSON-RPC client calls, hence
+    the given address must be hashable: unhashable values (e.g. `bytearray`) raise TypeError.
     """
 
     return account_address_bytes(addr).hex()
@@ -244,3 +247,13 @@ async def with_retry(coroutine, max_retries=5, delay_secs=0.1, exception=Excepti
                 await asyncio.sleep(delay_secs * tries)
             else:
                 raise e
+
+
+def backoff_delay_secs(tries: int, delay_secs: float, cap_secs: float) -> float:
+    """exponential backoff with jitter
+
+    Returns a random delay between `delay_secs` and `delay_secs * 2 ** (tries - 1)`, which is capped
+    by `cap_secs`, so that clients retrying at same time won't hit server in lockstep.
+    """
+
+    return random.uniform(delay_secs, min(cap_secs, delay_secs * 2 ** (tries - 1)))
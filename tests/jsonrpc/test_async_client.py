@@ -16,7 +16,7 @@ from diem.jsonrpc import AsyncClient
 from diem.testing import LocalAccount, Faucet, create_client, XUS, DD_ADDRESS
 from typing import AsyncGenerator
 
-import time, aiohttp, asyncio
+import dataclasses, gc, time, aiohttp, asyncio
 import pytest
 
 
@@ -215,7 +215,7 @@ async def test_submit_ignores_stale_resposne_error(client: AsyncClient):
     )
     txn = account.sign(create_transaction(account, script, 0))
     state = client.get_last_known_state()
-    client._last_known_server_state.version = state.version + 1_000_000_000
+    client._last_known_server_state = dataclasses.replace(state, version=state.version + 1_000_000_000)
     await client.submit(txn)
     client._last_known_server_state = state
     ret = await client.wait_for_transaction(txn)
@@ -433,6 +433,53 @@ async def test_raises_error_if_primary_and_backup_both_failed():
             assert await client.get_currencies()
 
 
+async def test_get_vasp_domain_map_prefetches_events_in_order():
+    pages = [
+        [("d1", "a1", False), ("d2", "a2", False)],
+        [("d1", "a1", True), ("d3", "a3", False)],
+        [("d1", "a4", False), ("d3", "a3", True)],
+        [("d4", "a5", False)],
+    ]
+    tasks = []
+
+    async def must_get_account(address):
+        return jsonrpc.Account(role=jsonrpc.AccountRole(vasp_domain_events_key="key"))
+
+    # pages 1 and 2 complete before page 0, the last page completes after the following prefetched
+    # page failed, and the others after the last page never complete
+    delays = [0.03, 0.02, 0.01, 0.05]
+
+    async def fetch_events(page):
+        if page == len(pages):
+            raise jsonrpc.NetworkError("error")
+        await asyncio.sleep(delays[page] if page < len(pages) else 10)
+        return [
+            jsonrpc.Event(data=jsonrpc.EventData(domain=domain, address=address, removed=removed))
+            for domain, address, removed in pages[page]
+        ]
+
+    def get_events(key, start, limit):
+        tasks.append(asyncio.ensure_future(fetch_events(start // limit)))
+        return tasks[-1]
+
+    errors = []
+    asyncio.get_event_loop().set_exception_handler(lambda loop, context: errors.append(context))
+    async with AsyncClient("url") as client:
+        client.must_get_account = must_get_account
+        client.get_events = get_events
+        for prefetch_depth, cancelled in [(3, [False] * 5 + [True]), (0, [False] * 4)]:
+            tasks.clear()
+            domain_map = await client.get_vasp_domain_map(batch_size=2, prefetch_depth=prefetch_depth)
+            await asyncio.sleep(0)
+            assert domain_map == {"d1": "a4", "d2": "a2", "d4": "a5"}
+            assert [task.cancelled() for task in tasks] == cancelled
+    tasks.clear()
+    gc.collect()
+    asyncio.get_event_loop().set_exception_handler(None)
+    # the error of failed prefetch is retrieved
+    assert errors == []
+
+
 def gen_metadata_response(client, fail=None, snap=None):
     async def send_request(url, request, ignore_stale_response):
         if fail == url:
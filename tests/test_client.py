@@ -3,8 +3,10 @@
 
 
 from diem import jsonrpc
-from concurrent.futures import ThreadPoolExecutor
-import pytest, time
+from diem.jsonrpc.client import _parse_obj, ACCEPT_ENCODING
+from google.protobuf import json_format
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+import pytest, time, json, requests, threading
 
 
 def test_update_last_known_state():
@@ -40,6 +42,72 @@ def test_update_last_known_state():
     assert client.get_last_known_state().timestamp_usecs == 3
 
 
+def test_last_known_state_is_not_changed_by_update():
+    client = jsonrpc.Client("url")
+    client.update_last_known_state(2, 2, 2)
+    state = client.get_last_known_state()
+
+    client.update_last_known_state(2, 3, 3)
+    assert state == jsonrpc.State(chain_id=2, version=2, timestamp_usecs=2)
+    assert client.get_last_known_state() == jsonrpc.State(chain_id=2, version=3, timestamp_usecs=3)
+
+
+def test_requests_transport_does_not_mount_adapters_on_given_session():
+    session = requests.Session()
+    adapter = session.get_adapter("http://localhost")
+    jsonrpc.RequestsTransport(session, 64, ["http://localhost"])
+    assert session.get_adapter("http://localhost") is adapter
+
+    transport = jsonrpc.RequestsTransport(None, 64, ["http://localhost"])
+    assert transport._session.get_adapter("http://localhost")._pool_maxsize == 64
+
+
+def test_requests_transport_sends_json_content_type_without_changing_session_headers():
+    session = requests.Session()
+    adapter = RecordingAdapter()
+    session.mount("http://localhost", adapter)
+    client = jsonrpc.Client("http://localhost", session=session)
+    assert client.get_currencies() == []
+    assert adapter.requests[0].headers["Content-Type"] == "application/json"
+    assert "Content-Type" not in session.headers
+
+
+def test_requests_transport_accepts_compressed_responses():
+    transport = jsonrpc.RequestsTransport()
+    adapter = RecordingAdapter()
+    transport._session.mount("http://localhost", adapter)
+    transport.post("http://localhost", b"{}", (1, 1))
+    assert adapter.requests[0].headers["Accept-Encoding"] == ACCEPT_ENCODING
+    assert {"gzip", "deflate"} <= set(ACCEPT_ENCODING.split(","))
+
+    session = requests.Session()
+    headers = dict(session.headers)
+    jsonrpc.RequestsTransport(session)
+    assert dict(session.headers) == {**headers, "User-Agent": jsonrpc.client.USER_AGENT_HTTP_HEADER}
+
+
+def test_httpx_transport():
+    httpx = pytest.importorskip("httpx")
+    received = []
+
+    def handler(request):
+        assert request.headers["Content-Type"] == "application/json"
+        received.append(json.loads(request.content))
+        if len(received) > 1:
+            return httpx.Response(500)
+        state = {"diem_chain_id": 2, "diem_ledger_version": 1, "diem_ledger_timestampusec": 1}
+        return httpx.Response(200, json={"jsonrpc": "2.0", "id": 1, "result": [], **state})
+
+    httpx_client = httpx.Client(transport=httpx.MockTransport(handler))
+    client = jsonrpc.Client("http://localhost", transport=jsonrpc.HTTPXTransport(httpx_client))
+    assert "Content-Type" not in httpx_client.headers
+    assert client.get_currencies() == []
+    assert received == [{"jsonrpc": "2.0", "id": 1, "method": "get_currencies", "params": []}]
+    assert client.get_last_known_state() == jsonrpc.State(chain_id=2, version=1, timestamp_usecs=1)
+    with pytest.raises(jsonrpc.NetworkError):
+        client.get_currencies()
+
+
 def test_invalid_server_url():
     client = jsonrpc.Client("url")
     with pytest.raises(jsonrpc.NetworkError):
@@ -102,6 +170,296 @@ def test_raises_error_if_primary_and_backup_both_failed():
         assert client.get_currencies()
 
 
+def test_backup_request_is_not_sent_after_primary_succeeded():
+    for fallback in [False, True]:
+        executor = ThreadPoolExecutor(1)
+        rs = jsonrpc.RequestWithBackups(backups=["backup"], executor=executor, fallback=fallback)
+        client = jsonrpc.Client("primary", rs=rs)
+        send_request = gen_metadata_response(client)
+        urls = []
+
+        def record_url(url, request, ignore_stale_response):
+            urls.append(url)
+            return send_request(url, request, ignore_stale_response)
+
+        client._send_http_request = record_url
+        assert client.get_metadata().script_hash_allow_list == ["primary"]
+        executor.shutdown(wait=True)
+        assert urls == ["primary"]
+
+        # the losing request is skipped when it is picked up after the response is picked
+        done = threading.Event()
+        done.set()
+        with pytest.raises(CancelledError):
+            rs._send(done, client, "backup", b"{}", False)
+        assert urls == ["primary"]
+
+
+def test_batch_execute_returns_results_in_order_of_calls():
+    client = jsonrpc.Client("url")
+
+    def send_request(url, request, ignore_stale_response):
+        return [
+            {"jsonrpc": "2.0", "id": req["id"], "result": {"version": req["params"][0]}, "diem_chain_id": 2}
+            for req in reversed(json.loads(request))
+        ]
+
+    def parser(result):
+        return result["version"]
+
+    client._send_http_request = send_request
+    assert client.batch_execute([("get_metadata", [1], parser), ("get_metadata", [2], parser)]) == [1, 2]
+
+
+def test_batch_execute_raises_json_rpc_error_if_any_call_failed():
+    client = jsonrpc.Client("url")
+
+    def send_request(url, request, ignore_stale_response):
+        return [
+            {"jsonrpc": "2.0", "id": 0, "result": {}},
+            {"jsonrpc": "2.0", "id": 1, "error": {"code": -32600, "message": "invalid request"}},
+        ]
+
+    client._send_http_request = send_request
+    with pytest.raises(jsonrpc.JsonRpcError):
+        client.batch_execute([("get_metadata", [], None), ("get_metadata", [], None)])
+
+
+def test_get_vasp_domain_map_fetches_events_by_batch_requests():
+    client = jsonrpc.Client("url")
+    client.must_get_account = lambda address: jsonrpc.Account(role=jsonrpc.AccountRole(vasp_domain_events_key="key"))
+
+    for num_events, num_requests in [(0, 1), (4, 2), (13, 3)]:
+        events = [{"domain": f"d{i}", "address": f"a{i}", "removed": False} for i in range(num_events)]
+        if num_events > 3:
+            events[3] = {"domain": "d0", "address": "a0", "removed": True}
+        received = []
+
+        def send_request(url, request, ignore_stale_response):
+            received.append([req["params"][1:] for req in json.loads(request)])
+            return [
+                {"jsonrpc": "2.0", "id": i, "result": [{"data": data} for data in events[start : start + limit]]}
+                for i, (start, limit) in enumerate(received[-1])
+            ]
+
+        client._send_http_request = send_request
+        domain_map = client.get_vasp_domain_map(batch_size=2, batches_per_request=3)
+        assert domain_map == {e["domain"]: e["address"] for e in events if e["domain"] != "d0"}
+        assert len(received) == num_requests
+        assert received[0] == [[0, 2]]
+        assert [start for calls in received for start, _ in calls] == list(range(0, 6 * num_requests - 4, 2))
+
+
+def test_cache_results_of_deterministic_calls():
+    client = jsonrpc.Client("url", cache=jsonrpc.RPCCacheConfig(enabled=True))
+    calls = []
+    send_request = gen_metadata_response(client)
+
+    def count_request(url, request, ignore_stale_response):
+        calls.append(json.loads(request)["params"])
+        return send_request(url, request, ignore_stale_response)
+
+    client._send_http_request = count_request
+    client.get_metadata(1)
+    client.get_metadata(1)
+    assert calls == [[1]]
+
+    client.get_metadata()
+    client.get_metadata()
+    assert calls == [[1], [], []]
+
+
+def test_cache_results_of_committed_transactions_and_account_states_with_ledger_version():
+    client = jsonrpc.Client("url", cache=jsonrpc.RPCCacheConfig(enabled=True))
+    calls = []
+
+    def send_request(url, request, ignore_stale_response):
+        req = json.loads(request)
+        calls.append((req["method"], req["params"]))
+        client.update_last_known_state(2, 10, 10)
+        result = [] if req["method"] == "get_transactions" else {"version": 1}
+        return {"jsonrpc": "2.0", "id": 1, "result": result}
+
+    client._send_http_request = send_request
+    client.get_metadata()
+    calls.clear()
+
+    # versions 5 to 9 are committed before the last known version 10
+    client.get_transactions(5, 5)
+    client.get_transactions(5, 5)
+    assert calls == [("get_transactions", [5, 5, False])]
+    client.get_transactions(6, 5)
+    client.get_transactions(6, 5)
+    assert calls[1:] == [("get_transactions", [6, 5, False])] * 2
+    calls.clear()
+
+    address = "00" * 16
+    client.get_account_state_with_proof(address, None, 9)
+    client.get_account_state_with_proof(address, None, 9)
+    assert calls == [("get_account_state_with_proof", [address, None, 9])]
+    client.get_account_state_with_proof(address)
+    client.get_account_state_with_proof(address)
+    assert calls[1:] == [("get_account_state_with_proof", [address, None, None])] * 2
+    calls.clear()
+
+    client.get_state_proof(9)
+    client.get_state_proof(9)
+    assert calls == [("get_state_proof", [9])] * 2
+
+
+def test_parse_obj_matches_protobuf_json_format():
+    txn = {
+        "version": 123,
+        "hash": "abcd",
+        "transaction": {"type": "user", "sequence_number": "3", "script": {"arguments": ["a", "b"]}},
+        "events": [{"key": "k", "data": {"type": "sentpayment", "amount": {"amount": 1, "currency": "XUS"}}}],
+        "vm_status": {"type": "executed"},
+        "unknown_field": "ignored",
+    }
+    expected = json_format.ParseDict(txn, jsonrpc.Transaction(), ignore_unknown_fields=True)
+    assert _parse_obj(lambda: jsonrpc.Transaction())(txn) == expected
+    assert _parse_obj(lambda: jsonrpc.Transaction())({}) is None
+
+    invalid_txns = [
+        {"version": "invalid"},
+        {"version": True},
+        {"transaction": {"script": {"arguments": "abc"}}},
+        {"events": {"key": "k"}},
+    ]
+    for invalid_txn in invalid_txns:
+        with pytest.raises(json_format.ParseError):
+            _parse_obj(lambda: jsonrpc.Transaction())(invalid_txn)
+    with pytest.raises(json_format.ParseError):
+        _parse_obj(lambda: jsonrpc.Account())({"is_frozen": 1})
+
+
+def test_get_parent_vasp_account_follows_parent_vasp_address():
+    client = jsonrpc.Client("url")
+    child, parent, cycle = "00" * 15 + "01", "00" * 15 + "02", "00" * 15 + "03"
+    accounts = {
+        child: jsonrpc.Account(role=jsonrpc.AccountRole(type="child_vasp", parent_vasp_address=parent)),
+        parent: jsonrpc.Account(role=jsonrpc.AccountRole(type="parent_vasp", base_url="http://vasp")),
+        cycle: jsonrpc.Account(role=jsonrpc.AccountRole(type="child_vasp", parent_vasp_address=cycle)),
+    }
+    client.must_get_account = lambda address: accounts[address]
+
+    assert client.get_parent_vasp_account(child) == accounts[parent]
+    assert client.get_parent_vasp_account(parent) == accounts[parent]
+    with pytest.raises(ValueError):
+        client.get_parent_vasp_account(cycle)
+
+
+def test_wait_for_transaction2_gets_transaction_with_events_after_found():
+    client = jsonrpc.Client("url")
+    include_events = []
+
+    def send_request(url, request, ignore_stale_response):
+        include_events.append(json.loads(request)["params"][2])
+        txn = {"hash": "ABCD", "vm_status": {"type": "executed"}, "events": [{"key": "key"}]}
+        return {"jsonrpc": "2.0", "id": 1, "result": txn if len(include_events) > 1 else None}
+
+    client._send_http_request = send_request
+    txn = client.wait_for_transaction2("00" * 16, 1, int(time.time()) + 10, "abcd", wait_duration_secs=0.01)
+    assert txn.events[0].key == "key"
+    assert include_events == [False, False, True]
+
+
+def test_wait_for_transaction2_adapts_wait_duration_to_server_state(monkeypatch):
+    client = jsonrpc.Client("url")
+    # server timestamp does not change in the first 12 polls, then advances in following polls
+    timestamps = [1] * 12 + [2, 3, 4]
+    sleeps = []
+
+    def send_request(url, request, ignore_stale_response):
+        include_events = json.loads(request)["params"][2]
+        ts = timestamps[min(len(sleeps), len(timestamps) - 1)]
+        client.update_last_known_state(2, ts, ts)
+        found = len(sleeps) >= len(timestamps)
+        txn = {"hash": "abcd", "vm_status": {"type": "executed"}} if include_events else True
+        return {"jsonrpc": "2.0", "id": 1, "result": txn if found else None}
+
+    client._send_http_request = send_request
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+    client.wait_for_transaction2("00" * 16, 1, int(time.time()) + 10, "abcd")
+
+    assert len(sleeps) == len(timestamps)
+    assert sleeps[0] == jsonrpc.DEFAULT_WAIT_FOR_TRANSACTION_MIN_WAIT_DURATION_SECS
+    assert sleeps[1:12] == sorted(sleeps[1:12])
+    assert sleeps[11] == jsonrpc.DEFAULT_WAIT_FOR_TRANSACTION_MAX_WAIT_DURATION_SECS
+    assert sleeps[12] < sleeps[11]
+    assert sleeps[14] < sleeps[13] < sleeps[12]
+
+
+def test_iter_transactions():
+    pytest.importorskip("ijson")
+
+    class Transport(jsonrpc.Transport):
+        def post(self, url, body, timeout):
+            start, limit = json.loads(body)["params"][:2]
+            return json.dumps(
+                {
+                    "jsonrpc": "2.0",
+                    "id": 1,
+                    "diem_chain_id": 2,
+                    "diem_ledger_version": 10,
+                    "diem_ledger_timestampusec": 100,
+                    "result": [{"version": v, "events": [{"key": "k"}]} for v in range(start, start + limit)],
+                }
+            ).encode()
+
+    client = jsonrpc.Client("url", transport=Transport())
+    txns = list(client.iter_transactions(3, 2, True))
+    assert [txn.version for txn in txns] == [3, 4]
+    assert txns[0].events[0].key == "k"
+    assert client.get_last_known_state() == jsonrpc.State(chain_id=2, version=10, timestamp_usecs=100)
+
+
+def test_iter_transactions_raises_json_rpc_error():
+    pytest.importorskip("ijson")
+
+    class Transport(jsonrpc.Transport):
+        def post(self, url, body, timeout):
+            return b'{"jsonrpc": "2.0", "id": 1, "error": {"code": -32600, "message": "invalid request"}}'
+
+    client = jsonrpc.Client("url", transport=Transport())
+    with pytest.raises(jsonrpc.JsonRpcError):
+        list(client.iter_transactions(0, 2))
+
+
+def test_iter_transactions_raises_invalid_server_response_if_result_is_not_list():
+    pytest.importorskip("ijson")
+
+    class Transport(jsonrpc.Transport):
+        def __init__(self, result):
+            self.result = result
+
+        def post(self, url, body, timeout):
+            return json.dumps({"jsonrpc": "2.0", "id": 1, "diem_chain_id": 2, "result": self.result}).encode()
+
+    for result in [{"version": 1}, None, 1]:
+        client = jsonrpc.Client("url", transport=Transport(result))
+        with pytest.raises(jsonrpc.InvalidServerResponse):
+            list(client.iter_transactions(0, 2))
+
+
+class RecordingAdapter(requests.adapters.BaseAdapter):
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        response = requests.Response()
+        response.status_code = 200
+        response.request = request
+        state = {"diem_chain_id": 2, "diem_ledger_version": 1, "diem_ledger_timestampusec": 1}
+        response._content = json.dumps({"jsonrpc": "2.0", "id": 1, "result": [], **state}).encode()
+        return response
+
+    def close(self):
+        pass
+
+
 def gen_metadata_response(client, fail=None, snap=None):
     def send_request(url, request, ignore_stale_response):
         if fail == url:
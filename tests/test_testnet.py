@@ -14,6 +14,7 @@ from diem import (
 )
 from diem.testing import LocalAccount
 
+import dataclasses
 import time
 import pytest
 
@@ -279,7 +280,7 @@ def test_submit_ignores_stale_resposne_error():
     )
     txn = account.create_signed_txn(0, payload)
     state = client.get_last_known_state()
-    client._last_known_server_state.version = state.version + 1_000_000_000
+    client._last_known_server_state = dataclasses.replace(state, version=state.version + 1_000_000_000)
     client.submit(txn)
     client._last_known_server_state = state
     assert client.wait_for_transaction(txn)
@@ -24,6 +24,22 @@ def test_account_address():
     assert utils.account_address(bytes.fromhex(valid_address)) == address
 
 
+def test_account_address_hex():
+    valid_address = "0000000000000000000000000A550C18"
+    address = utils.account_address(valid_address)
+    assert utils.account_address_hex(address) == valid_address.lower()
+    assert utils.account_address_hex(valid_address) == valid_address.lower()
+
+    hits = utils.account_address_hex.cache_info().hits
+    assert utils.account_address_hex(address) == valid_address.lower()
+    assert utils.account_address_hex.cache_info().hits == hits + 1
+
+    with pytest.raises(InvalidAccountAddressError):
+        utils.account_address_hex("aaaa")
+    with pytest.raises(TypeError):
+        utils.account_address_hex(bytearray(address.to_bytes()))
+
+
 def test_sub_address():
     with pytest.raises(InvalidSubAddressError):
         utils.sub_address(bytes.fromhex("aa"))
@@ -95,3 +111,12 @@ def test_to_snake():
 def test_hex():
     assert utils.hex(None) == ""
     assert utils.hex(b"abcd") == "61626364"
+
+
+def test_backoff_delay_secs():
+    for tries in range(1, 10):
+        delay = utils.backoff_delay_secs(tries, 0.1, 5)
+        assert 0.1 <= delay <= min(5, 0.1 * 2 ** (tries - 1))
+
+    assert utils.backoff_delay_secs(1, 0.1, 5) == 0.1
+    assert utils.backoff_delay_secs(20, 0.1, 5) <= 5